@@ -6,16 +6,32 @@ import os
 import sys
 import time
 import zlib
+import mmap
 import ctypes
 import signal
 import threading
 import concurrent.futures
-from dataclasses import dataclass
-from typing import TypedDict, List, Optional
+from dataclasses import dataclass, astuple
+from typing import List, Optional
 from datetime import datetime
 from types import FrameType
-from enum import Enum, auto
+from enum import Enum
 import json
+import queue
+import sqlite3
+import logging
+import logging.handlers
+
+try:
+    import xxhash  # 可选依赖：XXH3 校验，单核即可跑满 NVMe 带宽
+except ImportError:
+    xxhash = None
+
+try:
+    import google_crc32c  # 可选依赖：SSE4.2/ARMv8 硬件加速的 CRC-32C
+    _HW_CRC32C = google_crc32c.implementation == 'c'
+except ImportError:
+    _HW_CRC32C = False
 
 def set_window_title(title: str = "冷数据维护工具 v4.3") -> None:
     """设置控制台窗口标题"""
@@ -25,30 +41,86 @@ def set_window_title(title: str = "冷数据维护工具 v4.3") -> None:
 # ============================== 系统配置模块 ==============================
 @dataclass(frozen=True)
 class Config:
-    LOG_FILE: str = "refresh_log.json"
+    LOG_FILE: str = "refresh_log.db"       # 已刷新文件索引（SQLite）
+    LOG_BATCH: int = 1000                  # 索引每累计多少条记录提交一次事务
     CORRUPTED_LOG: str = "corrupted_files.log"
-    BUFFER_SIZE: int = 4 * 1024
+    LOG_QUEUE_SIZE: int = 10000            # 日志队列上限，写满时记录方阻塞等待
+    MMAP_WINDOW: int = 64 * 1024**2       # 刷新与校验的工作单元：按64MB窗口原位回写并回读校验
     MAX_RETRIES: int = 3
     LARGE_FILE: int = 100 * 1024**2      # 100MB以上为大文件
     MEDIUM_FILE: int = 10 * 1024**2       # 10MB-100MB为中等文件
     REPORT_INTERVAL: float = 0.2
     SKIP_SMALL: int = 1 * 1024**2        # 1MB以下为小文件（可跳过）
-    MAX_WORKERS: int = 4                  # 最大线程数
+    MAX_WORKERS: int = min(8, os.cpu_count() or 1)  # 最大处理线程数
+    SCAN_WORKERS: int = min(32, (os.cpu_count() or 1) * 4)  # 目录扫描线程数
     MEMORY_LIMIT_MB: int = 512            # 内存限制(MB)
 
 class FileCategory(Enum):
-    SMALL = auto()
-    MEDIUM = auto()
-    LARGE = auto()
+    # 取值与统计字段名一致，避免运行时拼接小写字符串
+    SMALL = 'small'
+    MEDIUM = 'medium'
+    LARGE = 'large'
 
 config = Config()
 
-# ============================== 数据模型模块 ==============================
-class LogData(TypedDict):
-    pending: list[str]
-    completed: list[str]
-    corrupted: list[str]
+# ============================== 日志模块 ==============================
+logger = logging.getLogger("coldatafresh")
+corrupted_logger = logging.getLogger("coldatafresh.corrupted")  # 只写入 CORRUPTED_LOG
+
+class BlockingQueueHandler(logging.handlers.QueueHandler):
+    """队列写满时阻塞等待，而不是丢弃记录"""
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self.queue.put(record)
+
+def setup_logging() -> logging.handlers.QueueListener:
+    """日志文件只打开一次，由后台线程统一写出；工作线程记录日志只需入队"""
+    file_handler = logging.FileHandler(config.CORRUPTED_LOG, encoding='utf-8', errors='replace', delay=True)
+    file_handler.setFormatter(logging.Formatter('%(asctime)s|%(message)s', '%Y-%m-%d %H:%M'))
+    file_handler.addFilter(logging.Filter(corrupted_logger.name))
+    console_handler = logging.StreamHandler()
+    console_handler.addFilter(lambda record: record.name != corrupted_logger.name)
+    
+    log_queue: queue.Queue = queue.Queue(maxsize=config.LOG_QUEUE_SIZE)
+    logger.addHandler(BlockingQueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler)
+    listener.start()
+    return listener
+
+# ============================== 校验算法模块 ==============================
+class CrcChecksum:
+    """增量CRC校验对象，接口与 xxhash 一致（update / intdigest）
+    优先使用硬件加速的 CRC-32C，未安装时退回 zlib.crc32
+    """
+    __slots__ = ('_crc',)
+    _HW_CHUNK = 1024 * 1024  # google_crc32c.extend 每次复制的字节数
+
+    def __init__(self):
+        self._crc = 0
+
+    def update(self, data) -> None:
+        if _HW_CRC32C:
+            # google_crc32c.extend 只接受 bytes，不接受 mmap/bytearray 的 memoryview；
+            # 按1MB分块复制，避免为整个64MB窗口再分配一份内存
+            with memoryview(data) as view:
+                for offset in range(0, len(view), self._HW_CHUNK):
+                    self._crc = google_crc32c.extend(self._crc, bytes(view[offset:offset + self._HW_CHUNK]))
+        else:
+            self._crc = zlib.crc32(data, self._crc)
+
+    def intdigest(self) -> int:
+        return self._crc
+
+def new_checksum():
+    """创建增量校验对象，按 xxhash → google-crc32c → zlib.crc32 的顺序选择算法
+    校验值只用于检测同一次运行内的写入损坏、从不持久化，因此切换算法是安全的
+    """
+    if xxhash is not None:
+        return xxhash.xxh3_64()
+    return CrcChecksum()
 
+# ============================== 数据模型模块 ==============================
 @dataclass
 class OperationStats:
     scanned: int = 0       # 已扫描文件总数
@@ -58,8 +130,68 @@ class OperationStats:
     small: int = 0
     corrupted: int = 0
     speed: float = 0.0
+    bytes_done: int = 0    # 已刷新字节数，用于计算总体处理速度
+    skipped: int = 0       # 近期已刷新且未变化而跳过的文件数
     progress: float = 0.0  # 总体进度百分比
 
+    def bump(self, category: FileCategory) -> None:
+        """按文件分类计数"""
+        if category is FileCategory.LARGE:
+            self.large += 1
+        elif category is FileCategory.MEDIUM:
+            self.medium += 1
+        else:
+            self.small += 1
+
+# ============================== 进度记录模块 ==============================
+class RefreshIndex:
+    """已刷新文件索引，使工具可以中断后继续、重复运行时跳过近期已刷新的文件
+    以规范化的绝对路径为主键：Windows 上 DirEntry.stat() 不提供 st_dev/st_ino，无法作为可靠的键
+    """
+    def __init__(self, path: str, min_days: int):
+        self._cutoff = time.time() - min_days * 86400  # 在此之后刷新过的文件仍不是冷数据
+        self._uncommitted = 0
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS refreshed ("
+            "path TEXT PRIMARY KEY, dev INTEGER, inode INTEGER, "
+            "size INTEGER, mtime_ns INTEGER, refreshed_at REAL)")
+
+    @staticmethod
+    def _key(path: str) -> str:
+        """统一大小写、分隔符和相对路径，使不同写法的同一目录得到相同的键"""
+        return os.path.normcase(os.path.abspath(path))
+
+    def is_fresh(self, path: str, st: os.stat_result) -> bool:
+        """文件自上次刷新后未变化，且上次刷新仍在时效内"""
+        row = self._conn.execute(
+            "SELECT dev, inode, size, mtime_ns, refreshed_at FROM refreshed WHERE path = ?",
+            (self._key(path),)).fetchone()
+        if row is None:
+            return False
+        dev, inode, size, mtime_ns, refreshed_at = row
+        if st.st_ino and (dev, inode) != (st.st_dev, st.st_ino):
+            return False  # 同名文件已被替换
+        return size == st.st_size and mtime_ns == st.st_mtime_ns and refreshed_at > self._cutoff
+
+    def record(self, path: str, st: os.stat_result) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO refreshed VALUES (?, ?, ?, ?, ?, ?)",
+            (self._key(path), st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, time.time()))
+        self._uncommitted += 1
+        if self._uncommitted >= config.LOG_BATCH:
+            self.commit()
+
+    def commit(self) -> None:
+        self._conn.commit()
+        self._uncommitted = 0
+
+    def close(self) -> None:
+        self.commit()
+        self._conn.close()
+
 # ============================== 终端控制模块 ==============================
 class TerminalManager:
     _instance = None
@@ -102,9 +234,8 @@ class TerminalManager:
         return cls._safe_mode
 
     @classmethod
-    def clear(cls) -> None:
-        if not cls._safe_mode:
-            sys.stdout.write('\033[2J\033[H')
+    def clear_sequence(cls) -> str:
+        return '' if cls._safe_mode else '\033[2J\033[H'
 
     @classmethod
     def colored_text(cls, text: str, fg: int = 37, bg: int = 44) -> str:
@@ -122,63 +253,124 @@ class Dashboard:
         self.start_time = time.time()
         self.last_update = 0.0
         self.last_scanned = 0  # 用于扫描速度计算
+        self._last_snapshot: tuple | None = None  # 上一帧的统计快照，未变化时跳过重绘
+        
+        # 后台渲染线程共享的最新状态
+        self._stats: OperationStats | None = None
+        self._phase = ""
+        self._lock = threading.RLock()  # 中断处理可能在主线程渲染途中重入
+        self._stop = threading.Event()
+        
+        # 边框、配色和静态信息行只在初始化时格式化一次
+        safe_mode = self.terminal.safe_mode()
+        border = self._BORDER_MAP[safe_mode]
+        self._v = border['vertical']
+        self._fill, self._empty = ('#', '-') if safe_mode else ('▓', '░')
+        self._phase_fmt = self.terminal.colored_text("{}", fg=33)
+        self._corrupted_fmt = self.terminal.colored_text("{}", fg=31)
+        self._cwd = os.getcwd()
+        
+        h_line = border['horizontal'] * 70
+        header = self.terminal.colored_text(" SSD冷数据维护系统 v4.3.2 作者:aspnmy By Python3.12.3 ", bg=44)
+        # 整帧模板：静态部分预先拼接，每帧只填入 {clock} 和 {body}
+        self._frame_template = "\n".join([
+            f"{self.terminal.clear_sequence()}",
+            h_line,
+            f"{header:^70}",
+            h_line,
+            *self._format_static([
+                "智能检测固态硬盘的冷数据并解决冷数据掉速问题。",
+                f"当前路径: {self._cwd}请复制在机械硬盘中运行",
+            ]),
+            "{clock}",
+            *self._format_static([
+                "请不要关闭窗口，否则扫描会中断。 ",
+                "请用管理员权限运行，不然有些文件扫描不全 ",
+            ]),
+            "{body}",
+            *self._format_static([
+                "本项目地址:https://github.com/aspnmy/ColDataRefresh.git ",
+                "感谢原作者:https://github.com/infrost/ColDataRefresh.git ",
+                "按Ctrl+C退出程序",
+            ]),
+            f"{self._v}{border['horizontal']*68}",
+        ]) + "\n"
+        
+        self._thread = threading.Thread(target=self._ui_loop, daemon=True)
+        self._thread.start()
 
     def _safe_print(self, text: str) -> str:
         return text.encode(sys.stdout.encoding, errors='replace').decode(sys.stdout.encoding)
 
-    def _render_header(self) -> None:
-        border = self._BORDER_MAP[self.terminal.safe_mode()]
-        h_line = border['horizontal'] * 70
-        header = self.terminal.colored_text(" SSD冷数据维护系统 v4.3.2 作者:aspnmy By Python3.12.3 ", bg=44)
-        print(self._safe_print(f"\n{h_line}\n{header:^70}\n{h_line}"))
+    def _format_lines(self, lines: list[str]) -> list[str]:
+        # 清理空行 - 右侧竖线完全不显示
+        return [f"{self._v} {line.ljust(68)}" for line in lines if line]
+
+    def _format_static(self, lines: list[str]) -> list[str]:
+        # 静态行会嵌入整帧模板，需要转义花括号
+        return [line.replace('{', '{{').replace('}', '}}') for line in self._format_lines(lines)]
 
-    def _render_stats(self, stats: OperationStats, phase: str) -> None:
-        border = self._BORDER_MAP[self.terminal.safe_mode()]
-        elapsed = time.time() - self.start_time
-        fill, empty = ('#', '-') if self.terminal.safe_mode() else ('▓', '░')
+    def _render_frame(self, stats: OperationStats, phase: str, now: float) -> str:
+        elapsed = now - self.start_time
         
         # 计算扫描速度
-        scan_speed = (stats.scanned - self.last_scanned) / max(elapsed - self.last_update, 0.001)
+        scan_speed = (stats.scanned - self.last_scanned) / max(now - self.last_update, 0.001)
         self.last_scanned = stats.scanned
         
         # 构建双重进度信息
         scan_info = f"发现文件: {stats.scanned}" if phase == "扫描中" else ""
-        process_bar = fill * int(50 * stats.progress) + empty * (50 - int(50 * stats.progress))
+        filled = int(50 * stats.progress)
+        process_bar = self._fill * filled + self._empty * (50 - filled)
         
-        info_lines = [
-            f"智能检测固态硬盘的冷数据并解决冷数据掉速问题。",
-            f"当前路径: {os.getcwd()}请复制在机械硬盘中运行",
-            f"当前时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
-            f"请不要关闭窗口，否则扫描会中断。 ",
-            f"请用管理员权限运行，不然有些文件扫描不全 ",
-            f"运行阶段: {self.terminal.colored_text(phase.ljust(12), fg=33)} 耗时: {elapsed:.1f}s",
+        body = self._format_lines([
+            f"运行阶段: {self._phase_fmt.format(phase.ljust(12))} 耗时: {elapsed:.1f}s",
             f"处理进度: [{process_bar}] {stats.progress:.1%}",
             f"{scan_info}",
             f"扫描速度: {scan_speed:.1f} MB/s, 处理速度: {stats.speed:.1f} MB/s ",
             f"文件分类: 大（大于100MB）({stats.large}) 中（10MB - 100MB）({stats.medium}) 小（小于10MB）({stats.small})",
-            f"损坏的文件: {self.terminal.colored_text(str(stats.corrupted), fg=31)}",
-            f"本项目地址:https://github.com/aspnmy/ColDataRefresh.git ",
-            f"感谢原作者:https://github.com/infrost/ColDataRefresh.git ",
-            f"按Ctrl+C退出程序"
+            f"损坏的文件: {self._corrupted_fmt.format(stats.corrupted)}",
+        ])
+        clock = self._format_lines([f"当前时间: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now))}"])
+        return self._frame_template.format(clock=clock[0], body="\n".join(body))
+
+    def _ui_loop(self) -> None:
+        """后台渲染线程：首次 update_display 之后按 REPORT_INTERVAL 周期重绘，终端输出不再阻塞扫描和刷新
+        即使长时间处理单个大文件、主线程没有新的状态，时钟和耗时也会继续刷新
+        """
+        while not self._stop.wait(config.REPORT_INTERVAL):
+            if self._stats is not None:
+                self._draw(self._stats, self._phase)
+
+    def _draw(self, stats: OperationStats, phase: str, force: bool = False) -> None:
+        with self._lock:
+            now = time.time()
             
-        ]
-        
-        # 清理空行并渲染 - 右侧竖线完全不显示
-        v = border['vertical']
-        for line in filter(None, info_lines):
-            print(self._safe_print(f"{v} {line.ljust(68)}"))
-        print(self._safe_print(f"{v}{border['horizontal']*68}"))
+            # 统计数据未变化时最多每秒重绘一次，仅用于刷新时间显示
+            snapshot = (astuple(stats), phase)
+            if not force and snapshot == self._last_snapshot and now - self.last_update < 1.0:
+                return
+            self._last_snapshot = snapshot
+
+            # 整帧拼接后一次性编码并写出
+            frame = self._render_frame(stats, phase, now)
+            sys.stdout.write(self._safe_print(frame))
+            sys.stdout.flush()
+            
+            self.last_update = now
 
     def update_display(self, stats: OperationStats, phase: str) -> None:
-        if time.time() - self.last_update < config.REPORT_INTERVAL:
-            return
+        """只记录最新状态，实际渲染由后台线程完成"""
+        self._stats = stats
+        self._phase = phase
 
-        self.terminal.clear()
-        self._render_header()
-        self._render_stats(stats, phase)
-        sys.stdout.flush()
-        
-        self.last_update = time.time()
+    def render_now(self, stats: OperationStats, phase: str) -> None:
+        """立即同步渲染一帧，用于等待用户输入之前和程序结束时"""
+        self._draw(stats, phase, force=True)
+
+    def close(self) -> None:
+        """停止后台渲染线程，之后只能通过 render_now 输出"""
+        self._stop.set()
+        self._thread.join()
 
 # ============================== 文件处理模块 ==============================
 class FileOperator:
@@ -194,88 +386,90 @@ class FileOperator:
         return FileCategory.MEDIUM if size > config.MEDIUM_FILE else FileCategory.SMALL
 
     @staticmethod
-    def checksum_file(path: str) -> int:
-        crc = 0
-        try:
-            with open(path, 'rb') as f:
-                while chunk := f.read(config.BUFFER_SIZE):
-                    crc = zlib.crc32(chunk, crc)
-        except IOError as e:
-            raise RuntimeError(f"文件读取失败: {str(e)}")
-        return crc
+    def _drop_cache(mm: mmap.mmap, fd: int, offset: int, length: int) -> None:
+        """丢弃已落盘窗口的页缓存，使回读校验真正从存储介质读取（仅在支持的平台上生效）"""
+        if hasattr(mmap, 'MADV_DONTNEED'):
+            mm.madvise(mmap.MADV_DONTNEED, offset, length)
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(fd, offset, length, os.POSIX_FADV_DONTNEED)
+
+    @staticmethod
+    def _checksum_mapped(mv: memoryview) -> int:
+        """对映射缓冲区按窗口整段计算校验值，每个窗口只调用一次校验函数"""
+        checksum = new_checksum()
+        for offset in range(0, len(mv), config.MMAP_WINDOW):
+            checksum.update(mv[offset:offset + config.MMAP_WINDOW])
+        return checksum.intdigest()
 
     @classmethod
-    def refresh_file(cls, path: str, stats: OperationStats, dashboard: Dashboard) -> dict:
-        """处理单个文件并返回统计信息（线程安全版本）"""
-        temp_file = f"{path}.tmp"
+    def refresh_file(cls, path: str, st: os.stat_result) -> dict:
+        """处理单个文件并返回结果（线程安全版本，不修改共享状态）
+        st 为扫描阶段取得的 stat 结果，用于检测扫描后文件是否被修改；
+        分类计数由主线程在提交任务时完成
+        """
         error_type = "UNKNOWN"
         result = {
-            'small': 0,
-            'large': 0,
-            'medium': 0,
             'corrupted': 0,
-            'speed': 0.0
+            'bytes': 0,
+            'stat': None  # 刷新前在打开的描述符上取得的最新 stat 结果
         }
         
         try:
-            start_time = time.time()
-            
-            # 文件分类处理
-            size = os.path.getsize(path)
-            if size < config.SKIP_SMALL:
-                result['small'] = 1
+            if st.st_size < config.SKIP_SMALL:
                 return result
 
-            category = cls.categorize_file(size)
-            result[category.name.lower()] = 1
-            
-            # 主体处理逻辑
-            src_crc = cls.checksum_file(path)
-            for attempt in range(config.MAX_RETRIES + 1):
-                try:
-                    dest_crc = 0
-                    processed_size = 0
-                    with open(path, 'rb') as src, open(temp_file, 'wb') as dest:
-                        while chunk := src.read(config.BUFFER_SIZE):
-                            dest.write(chunk)
-                            dest_crc = zlib.crc32(chunk, dest_crc)
-                            processed_size += len(chunk)
+            # 主体处理逻辑：按窗口读出数据并原位写回同一偏移，固件会把数据重新编程到新的闪存单元。
+            # 写回内容与原内容相同，中途中断也不会破坏文件，因此无需临时文件和双倍磁盘空间。
+            # 不使用 os.copy_file_range：原位刷新没有第二个文件，且它在 btrfs/XFS 上可能只做
+            # reflink 共享数据块而不真正重写闪存单元，违背刷新冷数据的目的
+            with open(path, 'r+b', buffering=0) as f:
+                # 在已打开的描述符上取最新状态：扫描后被修改过的文件不再是冷数据，跳过处理，
+                # 也避免把新内容的修改时间恢复成扫描时的旧值
+                fresh = os.fstat(f.fileno())
+                if (fresh.st_size, fresh.st_mtime_ns) != (st.st_size, st.st_mtime_ns):
+                    logger.info(f"文件在扫描后已被修改，跳过: {path}")
+                    return result
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE) as mm, memoryview(mm) as mv:
+                    if hasattr(mm, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                        mm.madvise(mmap.MADV_SEQUENTIAL)  # 提示内核顺序预读
+                    size = len(mm)  # 以实际映射长度为准，防止扫描后文件大小发生变化
+                    # 整个文件复用同一块窗口缓冲区，避免每个窗口都分配、清零再释放一个64MB的bytes对象
+                    buf = memoryview(bytearray(min(size, config.MMAP_WINDOW)))
+                    for offset in range(0, size, config.MMAP_WINDOW):
+                        end = min(offset + config.MMAP_WINDOW, size)
+                        data = buf[:end - offset]
+                        data[:] = mv[offset:end]
+                        expected = cls._checksum_mapped(data)
                     
-                    # 计算整个文件的平均处理速度
-                    process_time = time.time() - start_time
-                    if process_time > 0:
-                        result['speed'] = processed_size / process_time / 1024**2
-                    
-                    if src_crc == dest_crc:
-                        os.replace(temp_file, path)
-                        return result
-                    error_type = "CHECKSUM_ERROR"
-                except (IOError, OSError) as e:
-                    error_type = type(e).__name__
-                finally:
-                    if os.path.exists(temp_file):
-                        os.remove(temp_file)
-                
-                print(f"尝试重试 ({attempt+1}/{config.MAX_RETRIES})...")
-
-            result['corrupted'] = 1
-            raise RuntimeError(f"操作失败: {error_type}")
+                        # 每个窗口写回并落盘后回读校验，失败时用内存中保留的原数据重写
+                        for attempt in range(config.MAX_RETRIES + 1):
+                            mv[offset:end] = data
+                            mm.flush(offset, len(data))
+                            cls._drop_cache(mm, f.fileno(), offset, len(data))
+                            with mv[offset:end] as window:
+                                if cls._checksum_mapped(window) == expected:
+                                    break
+                            error_type = "CHECKSUM_ERROR"
+                            logger.warning(f"尝试重试 ({attempt+1}/{config.MAX_RETRIES})...")
+                        else:
+                            raise RuntimeError(f"操作失败: {error_type}")
+                os.fsync(f.fileno())
             
+            # 恢复原有的访问/修改时间
+            os.utime(path, ns=(fresh.st_atime_ns, fresh.st_mtime_ns))
+            result['bytes'] = size
+            result['stat'] = fresh
+
+        except PermissionError as e:
+            # 只读文件无法以 r+b 打开写回，属于权限问题而非数据损坏，跳过且不计入损坏记录
+            logger.warning(f"无写入权限，跳过: {path} - {str(e)}")
         except Exception as e:
             result['corrupted'] = 1
-            # 直接报错信息
-            print(f"❌ 无法读取文件: {path}")
-            print(f"   错误类型: {error_type}")
-            print(f"   错误信息: {str(e)}")
-            # 增强的日志记录
-            try:
-                log_entry = f"{datetime.now():%Y-%m-%d %H:%M}|{path}|{error_type}|{str(e)}\n"
-                with open(config.CORRUPTED_LOG, 'a', encoding='utf-8', errors='replace') as f:
-                    f.write(log_entry)
-                    f.flush()  # 强制写入磁盘
-            except Exception as log_error:
-                print(f"⚠️ 日志记录失败: {str(log_error)}")
-            dashboard.update_display(stats, "错误处理")
+            if error_type == "UNKNOWN":
+                error_type = type(e).__name__
+            # 报错信息和损坏记录只入队，由日志线程写出
+            logger.error(f"❌ 无法读取文件: {path}\n   错误类型: {error_type}\n   错误信息: {str(e)}")
+            corrupted_logger.error(f"{path}|{error_type}|{str(e)}")
         finally:
             return result
 
@@ -284,50 +478,134 @@ class ApplicationController:
     def __init__(self):
         self.dashboard = Dashboard()
         self.stats = OperationStats()
+        self.index: RefreshIndex | None = None  # 仅正常模式启用，基准测试每轮都完整处理
 
     def _handle_interrupt(self, _: int, __: FrameType | None) -> None:
-        self.dashboard.update_display(self.stats, "用户中止")
+        # 刷新索引由 execute 的 finally 在 SystemExit 传出时关闭，已完成的记录下次运行可继续
+        self.dashboard.close()
+        self.dashboard.render_now(self.stats, "用户中止")
         sys.exit(1)
 
-    def _collect_files(self, directory: str, min_days: int) -> list[str]:
-        """实时显示扫描进度"""
+    @staticmethod
+    def _scan_directory(directory: str, cutoff: float) -> tuple[list[tuple[str, os.stat_result]], list[str]]:
+        """扫描单个目录（不递归），返回冷文件的(路径, stat结果)列表和子目录列表"""
+        files: list[tuple[str, os.stat_result]] = []
+        subdirs: list[str] = []
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            # DirEntry 在 Windows 上缓存了 stat 结果，无需再次系统调用
+                            st = entry.stat(follow_symlinks=False)
+                            if st.st_mtime < cutoff:
+                                files.append((entry.path, st))
+                    except FileNotFoundError:
+                        continue  # 忽略临时删除的文件
+                    except Exception as e:
+                        logger.warning(f"扫描异常: {entry.path} - {str(e)}")
+        except OSError:
+            pass  # 与 os.walk 一致，忽略无法列出的目录
+        return files, subdirs
+
+    def _collect_files(self, directory: str, min_days: int) -> list[tuple[str, os.stat_result]]:
+        """多线程并行扫描各子目录，实时显示扫描进度"""
         cutoff = datetime.now().timestamp() - (min_days * 86400)
         file_list = []
         
-        for root, _, files in os.walk(directory):
-            for name in files:
-                try:
-                    path = os.path.join(root, name)
-                    if os.path.getmtime(path) < cutoff:
-                        file_list.append(path)
-                        self.stats.scanned += 1
-                        
-                        # 在扫描阶段就进行文件分类统计
-                        try:
-                            size = os.path.getsize(path)
-                            if size < config.SKIP_SMALL:
-                                self.stats.small += 1
-                            else:
-                                category = FileOperator.categorize_file(size)
-                                self.stats.__dict__[category.name.lower()] += 1
-                        except (OSError, FileNotFoundError):
-                            pass  # 忽略无法获取大小的文件
-                        
-                        # 实时刷新界面 (每秒最多10次)
-                        if time.time() - self.dashboard.last_update > 0.1:
-                            self.dashboard.update_display(self.stats, "扫描中")
-                except FileNotFoundError:
-                    continue  # 忽略临时删除的文件
-                except Exception as e:
-                    print(f"扫描异常: {os.path.join(root, name) if 'root' in locals() and 'name' in locals() else 'unknown'} - {str(e)}")
+        with concurrent.futures.ThreadPoolExecutor(max_workers=config.SCAN_WORKERS) as executor:
+            pending = {executor.submit(self._scan_directory, directory, cutoff)}
+            while pending:
+                done, pending = concurrent.futures.wait(
+                    pending, timeout=config.REPORT_INTERVAL,
+                    return_when=concurrent.futures.FIRST_COMPLETED)
+                # 结果只在主线程汇总，统计数据无需加锁
+                for future in done:
+                    files, subdirs = future.result()
+                    pending.update(executor.submit(self._scan_directory, d, cutoff) for d in subdirs)
+                    # 按目录批量累计，而不是逐个文件更新
+                    file_list.extend(files)
+                    self.stats.scanned += len(files)
+                    
+                    # 在扫描阶段就进行文件分类统计
+                    for _, st in files:
+                        self.stats.bump(FileOperator.categorize_file(st.st_size))
+                
+                # 实时刷新界面，由后台线程按 REPORT_INTERVAL 节流
+                self.dashboard.update_display(self.stats, "扫描中")
         
         return file_list
 
+    def _merge_results(self, done: set[concurrent.futures.Future],
+                       tasks: dict[concurrent.futures.Future, tuple[str, os.stat_result]],
+                       start_time: float, total_files: int) -> None:
+        """在主线程汇总已完成任务的结果，共享统计数据和刷新索引只在此处修改"""
+        for future in done:
+            path, _ = tasks.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"处理失败: {path} - {str(e)}")
+            else:
+                self.stats.corrupted += result['corrupted']
+                self.stats.bytes_done += result['bytes']
+                if self.index is not None and result['bytes'] and not result['corrupted']:
+                    try:
+                        self.index.record(path, result['stat'])
+                    except sqlite3.Error as e:
+                        logger.error(f"刷新索引写入失败: {path} - {str(e)}")
+            self.stats.processed += 1
+        self.stats.progress = self.stats.processed / total_files
+        elapsed = time.time() - start_time
+        if elapsed > 0:
+            self.stats.speed = self.stats.bytes_done / elapsed / 1024**2
+
+    def _process_files(self, target_files: list[tuple[str, os.stat_result]], skip_small: bool, phase: str) -> None:
+        """多线程刷新文件：工作线程负责IO与CRC，主线程汇总结果并刷新界面"""
+        total_files = len(target_files)
+        self.stats.progress = 0.1  # 进入处理阶段初始进度
+        start_time = time.time()
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=config.MAX_WORKERS) as executor:
+            pending: set[concurrent.futures.Future] = set()
+            tasks: dict[concurrent.futures.Future, tuple[str, os.stat_result]] = {}
+            for path, st in target_files:
+                if skip_small and st.st_size < config.SKIP_SMALL:
+                    self.stats.processed += 1  # 扫描阶段已计入小文件分类
+                    continue
+                if self.index is not None and self.index.is_fresh(path, st):
+                    self.stats.processed += 1
+                    self.stats.skipped += 1
+                    continue
+                
+                future = executor.submit(FileOperator.refresh_file, path, st)
+                tasks[future] = (path, st)
+                pending.add(future)
+                
+                # 内存控制：限制同时排队的任务数量
+                while len(pending) >= config.MAX_WORKERS * 2:
+                    done, pending = concurrent.futures.wait(
+                        pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    self._merge_results(done, tasks, start_time, total_files)
+                    self.dashboard.update_display(self.stats, phase)
+            
+            # 等待剩余任务完成
+            while pending:
+                done, pending = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                self._merge_results(done, tasks, start_time, total_files)
+                self.dashboard.update_display(self.stats, phase)
+        
+        if total_files:
+            self.stats.progress = self.stats.processed / total_files
+
     def execute(self) -> None:
         signal.signal(signal.SIGINT, self._handle_interrupt)
         
         # 用户配置阶段
-        self.dashboard.update_display(self.stats, "初始化")
+        self.dashboard.render_now(self.stats, "初始化")
         directory = input("扫描目录: ").strip('"').replace('：', ':')  # 中文冒号转英文冒号
         # 自动添加反斜杠如果用户没有输入
         if directory and not directory.endswith(('\\', '/')):
@@ -340,58 +618,18 @@ class ApplicationController:
         # 文件扫描阶段（实时显示进度）
         self.dashboard.update_display(self.stats, "扫描中")
         target_files = self._collect_files(directory, min_days)
-        total_files = len(target_files)
-        self.stats.progress = 0.1  # 进入处理阶段初始进度
-
-        # 文件处理阶段 - 多线程优化
-        start_time = time.time()
-        
-        # 内存优化：分批处理文件，避免内存溢出
-        batch_size = max(1, len(target_files) // (config.MAX_WORKERS * 2))
-        processed_count = 0
-        
-        with concurrent.futures.ThreadPoolExecutor(max_workers=config.MAX_WORKERS) as executor:
-            # 分批提交任务
-            futures = []
-            for path in target_files:
-                if skip_small and os.path.getsize(path) < config.SKIP_SMALL:
-                    self.stats.small += 1
-                    processed_count += 1
-                    continue
-                
-                # 提交任务到线程池
-                future = executor.submit(FileOperator.refresh_file, path, self.stats, self.dashboard)
-                futures.append(future)
-                
-                # 内存控制：限制同时运行的任务数量
-                if len(futures) >= config.MAX_WORKERS * 2:
-                    # 等待部分任务完成
-                    for future in concurrent.futures.as_completed(futures[:config.MAX_WORKERS]):
-                        try:
-                            future.result()
-                        except Exception as e:
-                            print(f"\n处理失败: {str(e)}")
-                        processed_count += 1
-                        self.stats.processed = processed_count
-                        self.stats.progress = processed_count / total_files if total_files else 0
-                        self.dashboard.update_display(self.stats, "处理中")
-                    
-                    futures = futures[config.MAX_WORKERS:]
-            
-            # 等待剩余任务完成
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    future.result()
-                except Exception as e:
-                    print(f"\n处理失败: {str(e)}")
-                processed_count += 1
-                self.stats.processed = processed_count
-                self.stats.progress = processed_count / total_files if total_files else 0
-                self.dashboard.update_display(self.stats, "处理中")
+        self.index = RefreshIndex(config.LOG_FILE, min_days)
+        try:
+            self._process_files(target_files, skip_small, "处理中")
+        finally:
+            # 无论正常结束、用户中止还是异常退出，都提交已完成的记录
+            self.index.close()
+            self.index = None
 
         # 结束阶段
-        self.dashboard.update_display(self.stats, "完成")
-        print(f"\n操作总结: 处理文件 {self.stats.processed} 个 (共发现 {self.stats.scanned} 个)")
+        self.dashboard.close()
+        self.dashboard.render_now(self.stats, "完成")
+        print(f"\n操作总结: 处理文件 {self.stats.processed} 个 (共发现 {self.stats.scanned} 个, 近期已刷新跳过 {self.stats.skipped} 个)")
         print(f"错误记录: {config.CORRUPTED_LOG}")
 
 # ============================== 基准测试模块 ==============================
@@ -412,11 +650,13 @@ class Benchmark:
             size_mb = random.choice(sizes_mb)
             file_path = os.path.join(directory, f"test_file_{i+1}_{size_mb}MB.dat")
             
-            # 创建文件内容（随机数据）
-            chunk_size = 1024 * 1024  # 1MB
+            # 创建文件内容：每个文件只生成1MB随机数据并重复写入，测试数据无需密码学强度的随机性
+            chunk = os.urandom(1024 * 1024)  # 1MB
             with open(file_path, 'wb') as f:
+                if hasattr(os, 'posix_fallocate'):
+                    os.posix_fallocate(f.fileno(), 0, size_mb * len(chunk))  # 预分配空间，减少碎片
                 for _ in range(size_mb):
-                    f.write(os.urandom(chunk_size))
+                    f.write(chunk)
             
             # 设置文件修改时间为过去（模拟冷数据）
             old_time = time.time() - (365 * 86400)  # 1年前
@@ -424,6 +664,17 @@ class Benchmark:
         
         print(f"测试文件创建完成，目录: {directory}")
 
+    @staticmethod
+    def evict_page_cache(directory: str) -> None:
+        """将测试文件逐出页缓存，使测得的是磁盘带宽而不是内存拷贝速度（仅在支持 posix_fadvise 的平台上生效）"""
+        if not hasattr(os, 'posix_fadvise'):
+            return
+        for root, _, files in os.walk(directory):
+            for name in files:
+                with open(os.path.join(root, name), 'rb', buffering=0) as f:
+                    os.fsync(f.fileno())  # 脏页无法被逐出，先落盘
+                    os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
     @staticmethod
     def run_benchmark(test_dir: str, iterations: int = 3) -> dict:
         """运行性能基准测试"""
@@ -433,33 +684,20 @@ class Benchmark:
             print(f"\n=== 基准测试第 {i+1}/{iterations} 轮 ===")
             
             # 重置统计
-            stats = OperationStats()
-            dashboard = Dashboard()
             controller = ApplicationController()
+            stats = controller.stats
+            
+            # 刚创建或上一轮刚刷新的文件仍在页缓存中，不逐出会测成内存速度
+            Benchmark.evict_page_cache(test_dir)
             
             # 运行测试
             start_time = time.time()
             
-            # 模拟用户输入
-            controller.directory = test_dir
-            controller.min_days = 0  # 处理所有文件
-            controller.skip_small = False
-            
-            # 收集文件
+            # 收集文件并使用与正常模式相同的多线程流程处理（处理所有文件）
             target_files = controller._collect_files(test_dir, 0)
             total_files = len(target_files)
-            
-            # 处理文件
-            for idx, path in enumerate(target_files, 1):
-                stats.progress = idx / total_files if total_files else 0
-                stats.processed = idx
-                
-                try:
-                    FileOperator.refresh_file(path, stats, dashboard)
-                except Exception as e:
-                    print(f"处理失败: {path} - {str(e)}")
-                
-                dashboard.update_display(stats, "基准测试中")
+            controller._process_files(target_files, False, "基准测试中")
+            controller.dashboard.close()
             
             end_time = time.time()
             
@@ -565,21 +803,26 @@ def main():
             print(f"测试目录不存在: {args.test_dir}")
             print("请先使用 --create-test-files 创建测试文件")
             return
-        
-        print("开始性能基准测试...")
-        results = Benchmark.run_benchmark(args.test_dir, args.iterations)
-        Benchmark.save_results(results)
-        
-        # 打印摘要
-        summary = results["summary"]
-        print(f"\n=== 基准测试摘要 ===")
-        print(f"平均耗时: {summary['avg_time']:.2f} 秒")
-        print(f"平均速度: {summary['avg_speed']:.2f} MB/s")
-        print(f"测试轮数: {summary['total_iterations']}")
-        
-    else:
-        # 正常模式
-        ApplicationController().execute()
+    
+    listener = setup_logging()
+    try:
+        if args.benchmark:
+            print("开始性能基准测试...")
+            results = Benchmark.run_benchmark(args.test_dir, args.iterations)
+            Benchmark.save_results(results)
+            
+            # 打印摘要
+            summary = results["summary"]
+            print(f"\n=== 基准测试摘要 ===")
+            print(f"平均耗时: {summary['avg_time']:.2f} 秒")
+            print(f"平均速度: {summary['avg_speed']:.2f} MB/s")
+            print(f"测试轮数: {summary['total_iterations']}")
+            
+        else:
+            # 正常模式
+            ApplicationController().execute()
+    finally:
+        listener.stop()  # 写出队列中剩余的日志
 
 
 if __name__ == "__main__":
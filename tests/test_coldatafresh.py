@@ -0,0 +1,38 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import coldatafresh  # noqa: E402
+
+try:
+    import google_crc32c
+except ImportError:
+    google_crc32c = None
+
+
+@unittest.skipIf(google_crc32c is None, "需要安装 google-crc32c")
+class HardwareCrcRefreshTest(unittest.TestCase):
+    """未安装 xxhash、使用 google-crc32c 校验时 refresh_file 应正常刷新"""
+
+    def test_refresh_file_with_hw_crc32c(self):
+        data = os.urandom(3 * 1024 * 1024 + 17)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'sample.bin')
+            with open(path, 'wb') as f:
+                f.write(data)
+            st = os.stat(path)
+            with mock.patch.object(coldatafresh, 'xxhash', None), \
+                    mock.patch.object(coldatafresh, '_HW_CRC32C', True):
+                result = coldatafresh.FileOperator.refresh_file(path, st)
+            self.assertEqual(result['corrupted'], 0)
+            self.assertEqual(result['bytes'], len(data))
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), data)
+
+
+if __name__ == '__main__':
+    unittest.main()